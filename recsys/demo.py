@@ -12,6 +12,7 @@ from recsys import (
     explore_dataset,
     get_top_n_products,
     recommend_for_user,
+    precompute_similarity,
     split_train_test,
     evaluate_recommendations
 )
@@ -72,9 +73,12 @@ def main():
         
         print("\nEvaluating recommendations...")
         
-        def recommend_wrapper(train_df, user_id, n):
+        # Build the item similarity once and share it across all users
+        model = precompute_similarity(train_df)
+        
+        def recommend_wrapper(train_df, user_id, n, model=None):
             try:
-                return recommend_for_user(train_df, user_id, n, min_similarity=0.1)
+                return recommend_for_user(train_df, user_id, n, min_similarity=0.1, model=model)
             except:
                 return []
         
@@ -83,7 +87,8 @@ def main():
             test_df, 
             recommend_wrapper,
             k_values=[5, 10],
-            relevance_threshold=4.0
+            relevance_threshold=4.0,
+            model=model
         )
         
         print("\n✅ Evaluation complete!")
@@ -13,10 +13,18 @@ __version__ = "0.1.0"
 
 from .data_loader import load_ratings
 from .recommended_top import get_top_n_products
-from .recommend_user import recommend_for_user, get_popular_items
+from .recommend_user import (
+    RecommenderModel,
+    recommend_for_user,
+    get_popular_items,
+    precompute_similarity,
+    clear_model_cache
+)
 from .utils import (
     normalize_ratings_per_user,
     get_user_statistics,
+    get_id_codes,
+    build_sparse_matrix,
     calculate_sparsity
 )
 from .data_exploration import (
@@ -26,6 +34,7 @@ from .data_exploration import (
 )
 from .evaluation import (
     split_train_test,
+    calculate_error_metrics,
     calculate_rmse,
     calculate_mae,
     precision_at_k,
@@ -41,12 +50,17 @@ __all__ = [
     
     # Recommendations
     "get_top_n_products",
+    "RecommenderModel",
     "recommend_for_user",
     "get_popular_items",
+    "precompute_similarity",
+    "clear_model_cache",
     
     # Utilities
     "normalize_ratings_per_user",
     "get_user_statistics",
+    "get_id_codes",
+    "build_sparse_matrix",
     "calculate_sparsity",
     
     # Exploration
@@ -56,6 +70,7 @@ __all__ = [
     
     # Evaluation
     "split_train_test",
+    "calculate_error_metrics",
     "calculate_rmse",
     "calculate_mae",
     "precision_at_k",
@@ -6,7 +6,34 @@ Use this to analyze your dataset before building recommendations.
 
 import pandas as pd
 import numpy as np
-from .utils import calculate_sparsity, get_user_statistics
+from .utils import calculate_sparsity, get_user_statistics, _ratings_per_id, _top_k_positions
+
+
+# Display labels for the half-star ratings of the default 0.5-5.0 scale
+HALF_STAR_LABELS = {half / 2: f"{half / 2:.1f}" for half in range(1, 11)}
+
+
+def _rating_distribution(ratings):
+    """
+    Count ratings per value, in increasing rating order.
+    
+    Half-star ratings (0.5 steps, the format of the default rating range) are
+    doubled to integers and counted with np.bincount; any other scale falls
+    back to a hash-based value count.
+    
+    Returns:
+    --------
+    dict
+        Mapping of rating value to number of ratings
+    """
+    doubled = ratings * 2
+    half_stars = doubled.astype(np.intp)
+    
+    if len(ratings) > 0 and half_stars.min() >= 0 and np.array_equal(half_stars, doubled):
+        counts = np.bincount(half_stars)
+        return {half / 2: int(count) for half, count in enumerate(counts) if count}
+    
+    return pd.Series(ratings).value_counts().sort_index().to_dict()
 
 
 def explore_dataset(df, show_top_users=10, show_top_products=10):
@@ -44,15 +71,19 @@ def explore_dataset(df, show_top_users=10, show_top_products=10):
     
     # Rating distribution
     print(f"\n⭐ Rating Distribution:")
-    rating_dist = df['rating'].value_counts().sort_index()
+    ratings = df['rating'].to_numpy()
+    rating_dist = _rating_distribution(ratings)
     for rating, count in rating_dist.items():
+        label = HALF_STAR_LABELS.get(rating)
+        if label is None:
+            label = f"{rating:.1f}"
         percentage = (count / n_ratings) * 100
         bar = "█" * int(percentage / 2)
-        print(f"   {rating:.1f}: {count:6,} ({percentage:5.2f}%) {bar}")
+        print(f"   {label}: {count:6,} ({percentage:5.2f}%) {bar}")
     
-    print(f"\n   Mean Rating: {df['rating'].mean():.3f}")
-    print(f"   Median Rating: {df['rating'].median():.3f}")
-    print(f"   Std Rating: {df['rating'].std():.3f}")
+    print(f"\n   Mean Rating: {ratings.mean(dtype=np.float64):.3f}")
+    print(f"   Median Rating: {np.median(ratings):.3f}")
+    print(f"   Std Rating: {ratings.std(dtype=np.float64, ddof=1):.3f}")
     
     # Sparsity analysis
     print(f"\n🕸️  Matrix Sparsity:")
@@ -67,43 +98,45 @@ def explore_dataset(df, show_top_users=10, show_top_products=10):
     
     # User statistics
     print(f"\n👥 User Activity:")
-    user_ratings = df.groupby('user_id').size()
+    # One grouped pass gives both the activity counts and the rating patterns
+    user_stats = get_user_statistics(df)
+    user_ids = user_stats['user_id'].to_numpy()
+    user_ratings = user_stats['rating_count'].to_numpy()
     print(f"   Min ratings per user: {user_ratings.min()}")
     print(f"   Max ratings per user: {user_ratings.max()}")
     print(f"   Mean ratings per user: {user_ratings.mean():.1f}")
-    print(f"   Median ratings per user: {user_ratings.median():.1f}")
+    print(f"   Median ratings per user: {np.median(user_ratings):.1f}")
     
     # Power users
     print(f"\n   Top {show_top_users} Most Active Users:")
-    top_users = user_ratings.nlargest(show_top_users)
-    for i, (user_id, count) in enumerate(top_users.items(), 1):
-        print(f"      {i}. User {user_id}: {count} ratings")
+    top_users = _top_k_positions(user_ratings, show_top_users)
+    for i, pos in enumerate(top_users, 1):
+        print(f"      {i}. User {user_ids[pos]}: {user_ratings[pos]} ratings")
     
     # Product statistics
     print(f"\n📦 Product Popularity:")
-    product_ratings = df.groupby('product_id').size()
+    product_ids, product_ratings, product_means = _ratings_per_id(df, 'product_id')
     print(f"   Min ratings per product: {product_ratings.min()}")
     print(f"   Max ratings per product: {product_ratings.max()}")
     print(f"   Mean ratings per product: {product_ratings.mean():.1f}")
-    print(f"   Median ratings per product: {product_ratings.median():.1f}")
+    print(f"   Median ratings per product: {np.median(product_ratings):.1f}")
     
     # Popular products
     print(f"\n   Top {show_top_products} Most Rated Products:")
-    top_products = product_ratings.nlargest(show_top_products)
-    for i, (product_id, count) in enumerate(top_products.items(), 1):
-        avg_rating = df[df['product_id'] == product_id]['rating'].mean()
-        print(f"      {i}. Product {product_id}: {count} ratings (avg: {avg_rating:.2f}⭐)")
+    top_products = _top_k_positions(product_ratings, show_top_products)
+    for i, pos in enumerate(top_products, 1):
+        print(f"      {i}. Product {product_ids[pos]}: {product_ratings[pos]} ratings "
+              f"(avg: {product_means[pos]:.2f}⭐)")
     
     # Cold start analysis
     print(f"\n❄️  Cold Start Analysis:")
-    users_with_few_ratings = (user_ratings < 5).sum()
-    products_with_few_ratings = (product_ratings < 5).sum()
+    users_with_few_ratings = int(np.count_nonzero(user_ratings < 5))
+    products_with_few_ratings = int(np.count_nonzero(product_ratings < 5))
     print(f"   Users with < 5 ratings: {users_with_few_ratings} ({users_with_few_ratings/n_users*100:.1f}%)")
     print(f"   Products with < 5 ratings: {products_with_few_ratings} ({products_with_few_ratings/n_products*100:.1f}%)")
     
     # Rating bias per user
     print(f"\n🎯 User Rating Patterns:")
-    user_stats = get_user_statistics(df)
     print(f"   Users with mean rating > 4.0 (lenient): {(user_stats['mean_rating'] > 4.0).sum()}")
     print(f"   Users with mean rating < 3.0 (strict): {(user_stats['mean_rating'] < 3.0).sum()}")
     print(f"   Overall user mean std: {user_stats['mean_rating'].std():.3f}")
@@ -115,7 +148,7 @@ def explore_dataset(df, show_top_users=10, show_top_products=10):
         'n_users': n_users,
         'n_products': n_products,
         'sparsity': sparsity_info,
-        'rating_distribution': rating_dist.to_dict(),
+        'rating_distribution': rating_dist,
         'user_stats': user_stats
     }
 
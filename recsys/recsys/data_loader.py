@@ -1,9 +1,184 @@
 import pandas as pd
+import numpy as np
 import os
 from pathlib import Path
+from .utils import ID_CODE_COLUMNS, IdMapping
 
+try:
+    import pyarrow  # noqa: F401 - only needed for the multi-threaded CSV reader
+    _CSV_ENGINE = "pyarrow"
+except ImportError:
+    _CSV_ENGINE = "c"
 
-def load_ratings(path, min_rating=0.5, max_rating=5.0, validate=True):
+
+REQUIRED_COLUMNS = ["user_id", "product_id", "rating", "timestamp"]
+
+
+def _check_required_columns(columns):
+    """Raise ValueError if any required ratings column is missing."""
+    missing_cols = [col for col in REQUIRED_COLUMNS if col not in columns]
+    if missing_cols:
+        raise ValueError(f"Missing required columns: {missing_cols}")
+
+
+def _check_int32_ids(df):
+    """Raise ValueError if an id does not fit the int32 columns (astype would wrap it)."""
+    limits = np.iinfo(np.int32)
+    for col in ["user_id", "product_id"]:
+        if len(df) and (df[col].max() > limits.max or df[col].min() < limits.min):
+            raise ValueError(f"{col} values exceed the int32 range [{limits.min}, {limits.max}]")
+
+
+def _read_ratings_pandas(path, min_rating, max_rating, validate):
+    """Read and validate ratings with pandas."""
+    # Load data
+    try:
+        df = pd.read_csv(path, engine=_CSV_ENGINE)
+    except Exception as e:
+        raise ValueError(f"Error reading CSV file: {e}")
+    
+    _check_required_columns(df.columns)
+    
+    # Parse the key columns as numbers before any comparison runs on them
+    try:
+        for col in ["user_id", "product_id", "rating"]:
+            df[col] = pd.to_numeric(df[col], errors="raise")
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Error converting data types: {e}")
+    
+    # Build every row filter into one boolean mask and apply it once
+    keep = df[["user_id", "product_id", "rating"]].notna().all(axis=1).to_numpy()
+    dropped_na = int(np.count_nonzero(~keep))
+    if dropped_na > 0:
+        print(f"⚠️  Removed {dropped_na} rows with missing values")
+    
+    if validate:
+        # Validate rating range
+        in_range = df["rating"].between(min_rating, max_rating).to_numpy()
+        num_invalid = int(np.count_nonzero(keep & ~in_range))
+        if num_invalid > 0:
+            print(f"⚠️  Found {num_invalid} ratings outside valid range [{min_rating}, {max_rating}]")
+        keep = keep & in_range
+        
+        # Check for negative IDs
+        negative_users = keep & (df["user_id"] < 0).to_numpy()
+        negative_products = keep & (df["product_id"] < 0).to_numpy()
+        num_negative_users = int(np.count_nonzero(negative_users))
+        num_negative_products = int(np.count_nonzero(negative_products))
+        if num_negative_users > 0 or num_negative_products > 0:
+            print(f"⚠️  Found {num_negative_users} negative user IDs and {num_negative_products} negative product IDs")
+        keep = keep & ~(negative_users | negative_products)
+    
+    df = df[keep]
+    
+    # Type conversions with error handling
+    try:
+        _check_int32_ids(df)
+        df = df.astype({"user_id": "int32", "product_id": "int32", "rating": "float32"})
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Error converting data types: {e}")
+    
+    if validate:
+        # Check for duplicates
+        num_rows = len(df)
+        df = df.drop_duplicates(subset=["user_id", "product_id"], keep="last")
+        num_duplicates = num_rows - len(df)
+        if num_duplicates > 0:
+            print(f"⚠️  Found {num_duplicates} duplicate user-product pairs, keeping most recent")
+    
+    # Convert timestamp
+    try:
+        df["timestamp"] = pd.to_datetime(df["timestamp"], unit="s", cache=True)
+    except Exception as e:
+        print(f"⚠️  Warning: Could not parse timestamps: {e}")
+        # If timestamp conversion fails, use current time as fallback
+        df["timestamp"] = pd.Timestamp.now()
+    
+    return df
+
+
+def _read_ratings_polars(path, min_rating, max_rating, validate):
+    """
+    Read and validate ratings with polars' multi-threaded engine.
+    
+    All filtering runs on the polars frame; it is converted to pandas only
+    once at the end (which needs pyarrow).
+    """
+    try:
+        import polars as pl
+    except ImportError:
+        raise ImportError("backend='polars' requires the polars package: pip install polars")
+    
+    # Load data
+    try:
+        df = pl.read_csv(path, schema_overrides={"rating": pl.Float32})
+    except Exception as e:
+        raise ValueError(f"Error reading CSV file: {e}")
+    
+    _check_required_columns(df.columns)
+    
+    # Parse text id columns as numbers before any comparison runs on them
+    text_ids = [col for col in ["user_id", "product_id"] if not df.schema[col].is_numeric()]
+    try:
+        df = df.with_columns(pl.col(text_ids).cast(pl.Float64, strict=True))
+    except Exception as e:
+        raise ValueError(f"Error converting data types: {e}")
+    
+    # Build every row filter into one expression and count all issues in one pass
+    not_null = pl.all_horizontal(pl.col(["user_id", "product_id", "rating"]).is_not_null())
+    keep = not_null
+    issue_counts = [(~not_null).sum().alias("missing")]
+    
+    if validate:
+        in_range = pl.col("rating").is_between(min_rating, max_rating)
+        negative_users = pl.col("user_id") < 0
+        negative_products = pl.col("product_id") < 0
+        issue_counts += [
+            (not_null & ~in_range).sum().alias("invalid"),
+            (not_null & in_range & negative_users).sum().alias("negative_users"),
+            (not_null & in_range & negative_products).sum().alias("negative_products"),
+        ]
+        keep = not_null & in_range & ~(negative_users | negative_products)
+    
+    issues = df.select(issue_counts).row(0, named=True)
+    if issues["missing"] > 0:
+        print(f"⚠️  Removed {issues['missing']} rows with missing values")
+    if validate:
+        if issues["invalid"] > 0:
+            print(f"⚠️  Found {issues['invalid']} ratings outside valid range [{min_rating}, {max_rating}]")
+        if issues["negative_users"] > 0 or issues["negative_products"] > 0:
+            print(f"⚠️  Found {issues['negative_users']} negative user IDs and {issues['negative_products']} negative product IDs")
+    
+    df = df.filter(keep)
+    
+    # Type conversions with error handling
+    try:
+        df = df.cast({"user_id": pl.Int32, "product_id": pl.Int32, "rating": pl.Float32})
+    except Exception as e:
+        raise ValueError(f"Error converting data types: {e}")
+    
+    if validate:
+        # Check for duplicates
+        num_rows = df.height
+        df = df.unique(subset=["user_id", "product_id"], keep="last", maintain_order=True)
+        num_duplicates = num_rows - df.height
+        if num_duplicates > 0:
+            print(f"⚠️  Found {num_duplicates} duplicate user-product pairs, keeping most recent")
+    
+    df = df.to_pandas()
+    
+    # Convert timestamp
+    try:
+        df["timestamp"] = pd.to_datetime(df["timestamp"], unit="s", cache=True)
+    except Exception as e:
+        print(f"⚠️  Warning: Could not parse timestamps: {e}")
+        # If timestamp conversion fails, use current time as fallback
+        df["timestamp"] = pd.Timestamp.now()
+    
+    return df
+
+
+def load_ratings(path, min_rating=0.5, max_rating=5.0, validate=True, backend="pandas"):
     """
     Load and validate ratings data from CSV file.
     
@@ -17,11 +192,18 @@ def load_ratings(path, min_rating=0.5, max_rating=5.0, validate=True):
         Maximum valid rating value (default: 5.0)
     validate : bool
         Whether to perform data validation (default: True)
+    backend : str
+        Engine used to parse and validate the CSV: 'pandas' (default) or
+        'polars' (multi-threaded; requires polars and pyarrow). The result
+        is a pandas DataFrame either way.
     
     Returns:
     --------
     pd.DataFrame
-        Cleaned and validated ratings dataframe
+        Cleaned and validated ratings dataframe, with dense int32
+        'user_code' and 'product_code' columns. The code -> id mappings
+        are stored in df.attrs['user_index'] and df.attrs['product_index']
+        (utils.IdMapping objects; the pd.Index is their .index).
     
     Raises:
     -------
@@ -34,63 +216,21 @@ def load_ratings(path, min_rating=0.5, max_rating=5.0, validate=True):
     if not os.path.exists(path):
         raise FileNotFoundError(f"Ratings file not found: {path}")
     
-    # Load data
-    try:
-        df = pd.read_csv(path)
-    except Exception as e:
-        raise ValueError(f"Error reading CSV file: {e}")
-    
-    # Check required columns
-    required_cols = ["user_id", "product_id", "rating", "timestamp"]
-    missing_cols = [col for col in required_cols if col not in df.columns]
-    if missing_cols:
-        raise ValueError(f"Missing required columns: {missing_cols}")
-    
-    # Remove rows with missing critical values
-    initial_rows = len(df)
-    df = df.dropna(subset=["user_id", "product_id", "rating"])
-    dropped_na = initial_rows - len(df)
-    if dropped_na > 0:
-        print(f"⚠️  Removed {dropped_na} rows with missing values")
-    
-    # Type conversions with error handling
-    try:
-        df["user_id"] = df["user_id"].astype(int)
-        df["product_id"] = df["product_id"].astype(int)
-        df["rating"] = df["rating"].astype(float)
-    except (ValueError, TypeError) as e:
-        raise ValueError(f"Error converting data types: {e}")
+    if backend == "pandas":
+        df = _read_ratings_pandas(path, min_rating, max_rating, validate)
+    elif backend == "polars":
+        df = _read_ratings_polars(path, min_rating, max_rating, validate)
+    else:
+        raise ValueError(f"Unknown backend: {backend}")
     
-    if validate:
-        # Validate rating range
-        invalid_ratings = df[(df["rating"] < min_rating) | (df["rating"] > max_rating)]
-        if len(invalid_ratings) > 0:
-            print(f"⚠️  Found {len(invalid_ratings)} ratings outside valid range [{min_rating}, {max_rating}]")
-            df = df[(df["rating"] >= min_rating) & (df["rating"] <= max_rating)]
-        
-        # Check for negative IDs
-        negative_users = df[df["user_id"] < 0]
-        negative_products = df[df["product_id"] < 0]
-        if len(negative_users) > 0 or len(negative_products) > 0:
-            print(f"⚠️  Found {len(negative_users)} negative user IDs and {len(negative_products)} negative product IDs")
-            df = df[(df["user_id"] >= 0) & (df["product_id"] >= 0)]
-        
-        # Check for duplicates
-        duplicates = df.duplicated(subset=["user_id", "product_id"], keep="last")
-        num_duplicates = duplicates.sum()
-        if num_duplicates > 0:
-            print(f"⚠️  Found {num_duplicates} duplicate user-product pairs, keeping most recent")
-            df = df[~duplicates]
-    
-    # Convert timestamp
-    try:
-        df["timestamp"] = pd.to_datetime(df["timestamp"], unit="s")
-    except Exception as e:
-        print(f"⚠️  Warning: Could not parse timestamps: {e}")
-        # If timestamp conversion fails, use current time as fallback
-        df["timestamp"] = pd.Timestamp.now()
+    # Attach dense 0..n-1 id codes so downstream code can index arrays directly;
+    # the code -> id mappings are kept in df.attrs
+    for column, (code_col, index_key) in ID_CODE_COLUMNS.items():
+        codes, uniques = pd.factorize(df[column], sort=True)
+        df[code_col] = codes.astype(np.int32)
+        df.attrs[index_key] = IdMapping(uniques)
     
     print(f"✅ Loaded {len(df)} valid ratings")
-    print(f"   Users: {df['user_id'].nunique()}, Products: {df['product_id'].nunique()}")
+    print(f"   Users: {len(df.attrs['user_index'])}, Products: {len(df.attrs['product_index'])}")
     
     return df
@@ -7,9 +7,9 @@ Includes:
 - Train/test split utilities
 """
 
-import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
+from joblib import Parallel, delayed, effective_n_jobs
+from .utils import get_id_codes
 
 
 def split_train_test(df, test_size=0.2, random_state=42, min_ratings_per_user=5):
@@ -30,33 +30,37 @@ def split_train_test(df, test_size=0.2, random_state=42, min_ratings_per_user=5)
     Returns:
     --------
     train_df, test_df : tuple of pd.DataFrame
-        Training and testing dataframes
+        Training and testing dataframes (keeping the index labels of df)
     """
-    # Filter users with sufficient ratings
-    user_counts = df.groupby('user_id').size()
-    valid_users = user_counts[user_counts >= min_ratings_per_user].index
-    df_filtered = df[df['user_id'].isin(valid_users)].copy()
-    
-    print(f"Filtered to {len(valid_users)} users with >= {min_ratings_per_user} ratings")
-    
-    # Split per user to ensure each user is in both train and test
-    train_dfs = []
-    test_dfs = []
-    
-    for user_id in valid_users:
-        user_data = df_filtered[df_filtered['user_id'] == user_id]
-        
-        if len(user_data) >= min_ratings_per_user:
-            train_user, test_user = train_test_split(
-                user_data, 
-                test_size=test_size, 
-                random_state=random_state
-            )
-            train_dfs.append(train_user)
-            test_dfs.append(test_user)
-    
-    train_df = pd.concat(train_dfs, ignore_index=True)
-    test_df = pd.concat(test_dfs, ignore_index=True)
+    # Filter users with sufficient ratings using dense user codes, so the
+    # per-row mask is a single gather instead of a hash lookup per row
+    user_codes, _ = get_id_codes(df, 'user_id')
+    user_counts = np.bincount(user_codes)
+    valid_rows = user_counts[user_codes] >= min_ratings_per_user
+    n_valid_users = int(np.count_nonzero(user_counts >= min_ratings_per_user))
+    df_filtered = df[valid_rows]
+    
+    print(f"Filtered to {n_valid_users} users with >= {min_ratings_per_user} ratings")
+    
+    # Each user's test count is ceil(test_size * count), clamped so both
+    # halves keep at least one of their ratings
+    codes = user_codes[valid_rows]
+    counts = user_counts[codes]
+    n_test = np.clip(np.ceil(test_size * counts), 1, counts - 1)
+    
+    # Rank each user's rows in a random order in one pass (sorted by user,
+    # then random key); the first n_test rows of each user go to test. The
+    # mask is positional, so duplicate index labels still split cleanly
+    keys = np.random.default_rng(random_state).random(len(codes))
+    order = np.lexsort((keys, codes))
+    group_starts = np.flatnonzero(np.r_[True, codes[order][1:] != codes[order][:-1]])
+    group_sizes = np.diff(np.r_[group_starts, len(order)])
+    ranks = np.empty(len(order), dtype=np.intp)
+    ranks[order] = np.arange(len(order)) - np.repeat(group_starts, group_sizes)
+    is_test = ranks < n_test
+    
+    test_df = df_filtered[is_test]
+    train_df = df_filtered[~is_test]
     
     print(f"Train set: {len(train_df)} ratings")
     print(f"Test set: {len(test_df)} ratings")
@@ -64,6 +68,32 @@ def split_train_test(df, test_size=0.2, random_state=42, min_ratings_per_user=5)
     return train_df, test_df
 
 
+def calculate_error_metrics(actual, predicted):
+    """
+    Calculate RMSE and MAE together in a single pass over the errors.
+    
+    Parameters:
+    -----------
+    actual : array-like
+        Actual ratings
+    predicted : array-like
+        Predicted ratings
+    
+    Returns:
+    --------
+    rmse, mae : tuple of float
+        RMSE and MAE values
+    """
+    diff = np.asarray(actual, dtype=np.float64) - np.asarray(predicted, dtype=np.float64)
+    n = len(diff)
+    
+    # einsum sums the squared errors without allocating diff ** 2
+    rmse = np.sqrt(np.einsum('i,i->', diff, diff) / n)
+    mae = np.abs(diff, out=diff).sum() / n
+    
+    return rmse, mae
+
+
 def calculate_rmse(actual, predicted):
     """
     Calculate Root Mean Squared Error.
@@ -80,13 +110,7 @@ def calculate_rmse(actual, predicted):
     float
         RMSE value
     """
-    actual = np.array(actual)
-    predicted = np.array(predicted)
-    
-    mse = np.mean((actual - predicted) ** 2)
-    rmse = np.sqrt(mse)
-    
-    return rmse
+    return calculate_error_metrics(actual, predicted)[0]
 
 
 def calculate_mae(actual, predicted):
@@ -105,12 +129,59 @@ def calculate_mae(actual, predicted):
     float
         MAE value
     """
-    actual = np.array(actual)
-    predicted = np.array(predicted)
+    return calculate_error_metrics(actual, predicted)[1]
+
+
+def _metrics_at_ks(recommended_items, relevant_items, k_values):
+    """
+    Calculate Precision@K, Recall@K and F1@K for several K values at once.
+    
+    Hits are counted in a single pass over the top max(K) recommendations and
+    accumulated with a cumulative sum, so each K is an O(1) lookup.
     
-    mae = np.mean(np.abs(actual - predicted))
+    Parameters:
+    -----------
+    recommended_items : list
+        List of recommended item IDs (in order)
+    relevant_items : set or frozenset
+        Set of relevant item IDs (other iterables are converted to a frozenset)
+    k_values : list
+        List of K values to evaluate
     
-    return mae
+    Returns:
+    --------
+    dict
+        Mapping of K to a dict with 'precision', 'recall' and 'f1'
+    """
+    if len(k_values) == 0:
+        return {}
+    
+    # Hash-based membership keeps each hit test O(1)
+    if not isinstance(relevant_items, (set, frozenset)):
+        relevant_items = frozenset(relevant_items)
+    
+    top_k = recommended_items[:max(k_values)]
+    hits = np.fromiter(
+        (item in relevant_items for item in top_k), dtype=np.int64, count=len(top_k)
+    )
+    # cum_hits[i] = number of relevant items among the first i recommendations
+    cum_hits = np.concatenate(([0], np.cumsum(hits)))
+    n_relevant = len(relevant_items)
+    
+    metrics = {}
+    for k in k_values:
+        relevant_in_top_k = int(cum_hits[min(k, len(top_k))])
+        precision = relevant_in_top_k / k if k > 0 else 0.0
+        recall = relevant_in_top_k / n_relevant if n_relevant > 0 else 0.0
+        
+        if precision + recall == 0:
+            f1 = 0.0
+        else:
+            f1 = 2 * (precision * recall) / (precision + recall)
+        
+        metrics[k] = {'precision': precision, 'recall': recall, 'f1': f1}
+    
+    return metrics
 
 
 def precision_at_k(recommended_items, relevant_items, k):
@@ -123,8 +194,8 @@ def precision_at_k(recommended_items, relevant_items, k):
     -----------
     recommended_items : list
         List of recommended item IDs (in order)
-    relevant_items : set
-        Set of relevant item IDs
+    relevant_items : set or frozenset
+        Set of relevant item IDs (other iterables are converted to a frozenset)
     k : int
         Number of top recommendations to consider
     
@@ -133,13 +204,7 @@ def precision_at_k(recommended_items, relevant_items, k):
     float
         Precision@K value (0-1)
     """
-    if k == 0:
-        return 0.0
-    
-    top_k = recommended_items[:k]
-    relevant_in_top_k = len([item for item in top_k if item in relevant_items])
-    
-    return relevant_in_top_k / k
+    return _metrics_at_ks(recommended_items, relevant_items, [k])[k]['precision']
 
 
 def recall_at_k(recommended_items, relevant_items, k):
@@ -152,8 +217,8 @@ def recall_at_k(recommended_items, relevant_items, k):
     -----------
     recommended_items : list
         List of recommended item IDs (in order)
-    relevant_items : set
-        Set of relevant item IDs
+    relevant_items : set or frozenset
+        Set of relevant item IDs (other iterables are converted to a frozenset)
     k : int
         Number of top recommendations to consider
     
@@ -162,13 +227,7 @@ def recall_at_k(recommended_items, relevant_items, k):
     float
         Recall@K value (0-1)
     """
-    if len(relevant_items) == 0:
-        return 0.0
-    
-    top_k = recommended_items[:k]
-    relevant_in_top_k = len([item for item in top_k if item in relevant_items])
-    
-    return relevant_in_top_k / len(relevant_items)
+    return _metrics_at_ks(recommended_items, relevant_items, [k])[k]['recall']
 
 
 def f1_score_at_k(recommended_items, relevant_items, k):
@@ -179,8 +238,8 @@ def f1_score_at_k(recommended_items, relevant_items, k):
     -----------
     recommended_items : list
         List of recommended item IDs (in order)
-    relevant_items : set
-        Set of relevant item IDs
+    relevant_items : set or frozenset
+        Set of relevant item IDs (other iterables are converted to a frozenset)
     k : int
         Number of top recommendations to consider
     
@@ -189,17 +248,41 @@ def f1_score_at_k(recommended_items, relevant_items, k):
     float
         F1@K value (0-1)
     """
-    precision = precision_at_k(recommended_items, relevant_items, k)
-    recall = recall_at_k(recommended_items, relevant_items, k)
+    return _metrics_at_ks(recommended_items, relevant_items, [k])[k]['f1']
+
+
+def _evaluate_users(train_df, user_ids, relevant_by_user, recommend_func, k_values, model):
+    """
+    Compute ranking metrics for a batch of users.
+    
+    Returns:
+    --------
+    list
+        One _metrics_at_ks dict per user that received recommendations
+    """
+    max_k = max(k_values)
+    user_results = []
     
-    if precision + recall == 0:
-        return 0.0
+    for user_id in user_ids:
+        # Generate recommendations
+        if model is None:
+            recommendations = recommend_func(train_df, user_id, max_k)
+        else:
+            recommendations = recommend_func(train_df, user_id, max_k, model=model)
+        
+        if len(recommendations) == 0:
+            continue
+        
+        recommended_items = recommendations['product_id'].tolist()
+        user_results.append(
+            _metrics_at_ks(recommended_items, relevant_by_user[user_id], k_values)
+        )
     
-    return 2 * (precision * recall) / (precision + recall)
+    return user_results
 
 
 def evaluate_recommendations(train_df, test_df, recommend_func, k_values=[5, 10, 20],
-                             relevance_threshold=4.0):
+                             relevance_threshold=4.0, model=None, n_jobs=1):
     """
     Comprehensive evaluation of recommendation quality.
     
@@ -210,11 +293,21 @@ def evaluate_recommendations(train_df, test_df, recommend_func, k_values=[5, 10,
     test_df : pd.DataFrame
         Testing data
     recommend_func : callable
-        Function that takes (train_df, user_id, n) and returns recommendations
+        Function that takes (train_df, user_id, n) and returns recommendations.
+        It is only called for users present in train_df and should return an
+        empty result rather than raise when it has nothing to recommend.
     k_values : list
         List of K values to evaluate
     relevance_threshold : float
         Rating threshold to consider an item "relevant"
+    model : object, optional
+        Precomputed model built once from train_df (e.g. the result of
+        precompute_similarity). When given, it is passed to recommend_func
+        as the keyword argument ``model`` so it is shared by all users.
+    n_jobs : int
+        Number of worker processes for the per-user loop (default: 1, -1 uses
+        all cores). Users are split into one batch per worker so train_df and
+        model are sent to each worker only once.
     
     Returns:
     --------
@@ -227,45 +320,42 @@ def evaluate_recommendations(train_df, test_df, recommend_func, k_values=[5, 10,
     
     results = {k: {'precision': [], 'recall': [], 'f1': []} for k in k_values}
     
-    # Get unique users in test set
-    test_users = test_df['user_id'].unique()
-    evaluated_users = 0
+    # Collect each user's highly rated test items (relevant items) in one pass;
+    # users with no relevant items never get a key and are skipped
+    relevant_by_user = (
+        test_df[test_df['rating'] >= relevance_threshold]
+        .groupby('user_id')['product_id']
+        .agg(frozenset)
+        .to_dict()
+    )
+    
+    # Only users with training data can get recommendations
+    train_users = set(train_df['user_id'].unique())
+    eligible_users = [user_id for user_id in relevant_by_user if user_id in train_users]
+    
+    # Users are independent, so evaluate them in one batch per worker
+    n_batches = max(min(len(eligible_users), effective_n_jobs(n_jobs)), 1)
+    batches = [eligible_users[i::n_batches] for i in range(n_batches)]
+    batch_results = Parallel(n_jobs=n_jobs)(
+        delayed(_evaluate_users)(
+            train_df,
+            batch,
+            {user_id: relevant_by_user[user_id] for user_id in batch},
+            recommend_func,
+            k_values,
+            model
+        )
+        for batch in batches
+    )
     
-    for user_id in test_users:
-        try:
-            # Get user's test items that they rated highly (relevant items)
-            user_test = test_df[test_df['user_id'] == user_id]
-            relevant_items = set(
-                user_test[user_test['rating'] >= relevance_threshold]['product_id']
-            )
-            
-            if len(relevant_items) == 0:
-                continue  # Skip users with no relevant items
-            
-            # Generate recommendations
-            max_k = max(k_values)
-            recommendations = recommend_func(train_df, user_id, max_k)
-            
-            if len(recommendations) == 0:
-                continue
-            
-            recommended_items = recommendations['product_id'].tolist()
-            
-            # Calculate metrics for each K
+    evaluated_users = 0
+    for user_results in batch_results:
+        for user_metrics in user_results:
             for k in k_values:
-                precision = precision_at_k(recommended_items, relevant_items, k)
-                recall = recall_at_k(recommended_items, relevant_items, k)
-                f1 = f1_score_at_k(recommended_items, relevant_items, k)
-                
-                results[k]['precision'].append(precision)
-                results[k]['recall'].append(recall)
-                results[k]['f1'].append(f1)
-            
+                results[k]['precision'].append(user_metrics[k]['precision'])
+                results[k]['recall'].append(user_metrics[k]['recall'])
+                results[k]['f1'].append(user_metrics[k]['f1'])
             evaluated_users += 1
-            
-        except Exception as e:
-            # Skip users that cause errors
-            continue
     
     # Calculate average metrics
     print(f"\nEvaluated {evaluated_users} users")
@@ -306,7 +396,13 @@ def evaluate_rating_prediction(train_df, test_df, predict_func):
     test_df : pd.DataFrame
         Testing data  
     predict_func : callable
-        Function that takes (train_df, user_id, product_id) and returns predicted rating
+        Function that takes (train_df, user_ids, product_ids) as arrays and
+        returns an array of predicted ratings. Mark it with ``batched = True``
+        to have it called once for the whole test set; otherwise it is treated
+        as the legacy per-pair (train_df, user_id, product_id) callable,
+        which receives the ids as Python ints for integer id columns (not
+        the floats that iterrows() produced next to a float rating column).
+        NaN predictions and pairs that raise are skipped.
     
     Returns:
     --------
@@ -317,23 +413,33 @@ def evaluate_rating_prediction(train_df, test_df, predict_func):
     print("📊 EVALUATING RATING PREDICTION")
     print("=" * 70)
     
-    actual_ratings = []
-    predicted_ratings = []
+    pairs = test_df[['user_id', 'product_id']].to_numpy()
+    user_ids, product_ids = pairs[:, 0], pairs[:, 1]
+    
+    if getattr(predict_func, 'batched', False):
+        predicted_ratings = np.asarray(
+            predict_func(train_df, user_ids, product_ids), dtype=float
+        )
+    else:
+        # Write each prediction straight into a preallocated float buffer
+        # (np.vectorize would box every result in an object array first)
+        predicted_ratings = np.full(len(test_df), np.nan)
+        for i, (user_id, product_id) in enumerate(zip(user_ids.tolist(), product_ids.tolist())):
+            try:
+                predicted_ratings[i] = predict_func(train_df, user_id, product_id)
+            except Exception:
+                continue
     
-    for _, row in test_df.iterrows():
-        try:
-            predicted = predict_func(train_df, row['user_id'], row['product_id'])
-            actual_ratings.append(row['rating'])
-            predicted_ratings.append(predicted)
-        except:
-            continue
+    # Skip pairs that could not be predicted
+    valid = ~np.isnan(predicted_ratings)
+    actual_ratings = test_df['rating'].to_numpy()[valid]
+    predicted_ratings = predicted_ratings[valid]
     
     if len(actual_ratings) == 0:
         print("⚠️  No predictions could be made")
         return {}
     
-    rmse = calculate_rmse(actual_ratings, predicted_ratings)
-    mae = calculate_mae(actual_ratings, predicted_ratings)
+    rmse, mae = calculate_error_metrics(actual_ratings, predicted_ratings)
     
     print(f"\nPredicted {len(actual_ratings)} ratings")
     print(f"RMSE: {rmse:.4f}")
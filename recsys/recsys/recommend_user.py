@@ -1,13 +1,449 @@
 import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+from scipy import sparse
+from .utils import build_sparse_matrix, _ratings_per_id, _top_k_positions
+
+try:
+    from numba import njit, prange
+    _HAS_NUMBA = True
+except ImportError:
+    _HAS_NUMBA = False
+
+
+if _HAS_NUMBA:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _accumulate_scores_numba(indptr, indices, data, ratings, min_sim,
+                                 sums_out, weights_out, similar_out):
+        """Per-item CSR row loop of _accumulate_scores, parallel over items."""
+        for item in prange(len(indptr) - 1):
+            weighted_sum = 0.0
+            weight = 0.0
+            similar = False
+            for pos in range(indptr[item], indptr[item + 1]):
+                sim = data[pos]
+                if sim >= min_sim:
+                    weighted_sum += sim * ratings[indices[pos]]
+                    weight += abs(sim)
+                    similar = True
+            sums_out[item] = weighted_sum
+            weights_out[item] = weight
+            similar_out[item] = similar
+
+
+def _accumulate_scores(sim_rated, ratings, min_similarity):
+    """
+    Accumulate similarity-weighted ratings over a sparse similarity slice.
+    
+    Parameters:
+    -----------
+    sim_rated : scipy.sparse.csr_matrix
+        Similarity of every item (rows) to each rated item (columns)
+    ratings : np.ndarray
+        The user's rating of each rated item (one per column)
+    min_similarity : float
+        Similarities below this threshold are ignored
+    
+    Returns:
+    --------
+    tuple
+        (weighted_sums, score_weights, has_similar) arrays with one entry per
+        item; has_similar flags items with any sufficiently similar rated item
+    """
+    n_items, n_rated = sim_rated.shape
+    indptr, indices, data = sim_rated.indptr, sim_rated.indices, sim_rated.data
+    # Contiguous ratings of the similarity dtype: a float64 vector would make
+    # the SpMVs upcast (copy) the whole float32 slice, and numba respecialize
+    ratings = np.ascontiguousarray(ratings, dtype=data.dtype)
+    
+    if _HAS_NUMBA:
+        weighted_sums = np.empty(n_items)
+        score_weights = np.empty(n_items)
+        has_similar = np.empty(n_items, dtype=bool)
+        _accumulate_scores_numba(indptr, indices, data, ratings, min_similarity,
+                                 weighted_sums, score_weights, has_similar)
+    else:
+        # Three SpMVs over a thresholded copy: weighted ratings, weights and hits
+        keep = data >= min_similarity
+        thresholded = sparse.csr_matrix((np.where(keep, data, 0), indices, indptr),
+                                        shape=sim_rated.shape)
+        ones = np.ones(n_rated, dtype=data.dtype)
+        weighted_sums = thresholded @ ratings
+        thresholded.data = np.abs(thresholded.data)
+        score_weights = thresholded @ ones
+        thresholded.data = keep.astype(data.dtype)
+        has_similar = (thresholded @ ones) > 0
+    
+    # Unstored similarities are exactly 0, which passes a non-positive threshold
+    if min_similarity <= 0:
+        has_similar |= np.diff(indptr) < n_rated
+    
+    return weighted_sums, score_weights, has_similar
+
+
+class RecommenderModel:
+    """
+    Item-based collaborative filtering model, fitted once and queried per user.
+    
+    fit() builds the sparse user-item matrix and L2-normalized item vectors;
+    recommend() then only computes the similarity columns of one user's rated
+    items, so serving many users does not repeat the O(items * users) build.
+    
+    Parameters:
+    -----------
+    use_normalized : bool
+        Whether to use normalized ratings for similarity calculation
+    normalization_method : str
+        Method for rating normalization ('mean_center', 'z_score', 'min_max')
+    """
+    
+    def __init__(self, use_normalized=False, normalization_method='mean_center'):
+        self.use_normalized = use_normalized
+        self.normalization_method = normalization_method
+    
+    def fit(self, df):
+        """
+        Build the user-item matrix and normalized item vectors from df.
+        
+        Parameters:
+        -----------
+        df : pd.DataFrame
+            DataFrame with columns: user_id, product_id, rating
+        
+        Returns:
+        --------
+        RecommenderModel
+            The fitted model (self)
+        """
+        # Normalize ratings if requested
+        if self.use_normalized:
+            from .utils import normalize_ratings_per_user
+            normalized_ratings, self.user_stats = normalize_ratings_per_user(
+                df, method=self.normalization_method, return_stats=True)
+            ratings_df = df.assign(normalized_rating=normalized_ratings)
+            rating_col = 'normalized_rating'
+        else:
+            ratings_df = df
+            rating_col = 'rating'
+            self.user_stats = None
+        
+        # Create the sparse user-item matrix over the users and products in df
+        matrix, user_index, product_index = build_sparse_matrix(ratings_df, normalize=False, rating_col=rating_col)
+        # Undefined normalized ratings (e.g. z-score of a single rating) carry no signal
+        matrix.data = np.nan_to_num(matrix.data)
+        
+        # L2-normalize item columns so cosine similarity is a plain dot product;
+        # column norms and scaling work directly on the stored entries
+        squares = np.bincount(matrix.indices, weights=matrix.data * matrix.data,
+                              minlength=matrix.shape[1])
+        norms = np.sqrt(squares).astype(np.float32)
+        norms[norms == 0] = 1
+        normalized = matrix.copy()
+        normalized.data /= norms[normalized.indices]
+        
+        self.df = df
+        self.matrix = matrix
+        self.user_index = user_index
+        self.product_index = product_index
+        self.normalized = normalized.tocsc()
+        self._popular = {}
+        
+        return self
+    
+    def recommend(self, user_id, n=10, min_similarity=0.1, min_common_items=2):
+        """
+        Generate recommendations for one user of the fitted data.
+        
+        Parameters:
+        -----------
+        user_id : int
+            The user ID to generate recommendations for
+        n : int
+            Number of recommendations to return
+        min_similarity : float
+            Minimum similarity threshold (0-1). Items with lower similarity are ignored.
+        min_common_items : int
+            Minimum number of common ratings needed to calculate similarity
+        
+        Returns:
+        --------
+        pd.DataFrame
+            Recommended products with columns: product_id, score, estimated_rating
+        
+        Raises:
+        -------
+        ValueError
+            If user_id is not in the fitted data
+        """
+        if user_id not in self.user_index:
+            raise ValueError(f"User {user_id} not found in dataset.")
+        
+        # Get user's ratings (columns follow the product_index order); rated
+        # items are the positive entries, as with the former pivot_table matrix
+        user_row = self.user_index.get_loc(user_id)
+        user_ratings = self.matrix[user_row].toarray().ravel()
+        rated_mask = user_ratings > 0
+        n_rated = int(np.count_nonzero(rated_mask))
+        
+        # Check for cold start problem before any similarity work
+        if n_rated < min_common_items:
+            if n_rated == 0:
+                return _cold_start_fallback(self.df, user_id, n)
+            print(f"⚠️  User {user_id} has very few ratings ({n_rated}), recommendations may be unreliable")
+        
+        # Cosine similarity of every item to each rated item (items x rated), kept sparse
+        sim_rated = (self.normalized.T @ self.normalized[:, rated_mask]).tocsr()
+        
+        # Weighted sum: similarity * rating, normalized by sum of similarities
+        # (in place; items without weight keep their raw sum)
+        scores, score_weights, has_similar = _accumulate_scores(
+            sim_rated, user_ratings[rated_mask], min_similarity)
+        np.divide(scores, score_weights, out=scores, where=score_weights > 0)
+        
+        # Only consider unrated items with at least one sufficiently similar rated item
+        candidates = np.flatnonzero((user_ratings == 0) & has_similar)
+        
+        # Convert to DataFrame
+        if len(candidates) == 0:
+            print(f"⚠️  No recommendations found for user {user_id} (try lowering min_similarity)")
+            return pd.DataFrame(columns=["product_id", "score", "estimated_rating"])
+        
+        top = candidates[_top_k_positions(scores[candidates], n)]
+        recs = pd.DataFrame({
+            "product_id": self.product_index[top],
+            "score": scores[top]
+        })
+        
+        recs['estimated_rating'] = self._estimated_ratings(user_id, recs['score'].to_numpy())
+        
+        return recs
+    
+    def _estimated_ratings(self, user_id, scores):
+        """Denormalize one user's scores to the rating scale, clipped to 0.5-5.0."""
+        # Denormalize if needed, with the per-user statistics kept by fit()
+        if self.use_normalized and self.normalization_method == 'mean_center':
+            user_mean = self.user_stats.at[user_id, 'mean_rating']
+            estimated = scores + user_mean
+        elif self.use_normalized and self.normalization_method == 'z_score':
+            user_mean = self.user_stats.at[user_id, 'mean_rating']
+            user_std = self.user_stats.at[user_id, 'std_rating']
+            estimated = (scores * user_std) + user_mean
+        else:
+            estimated = scores
+        
+        # Clip ratings to valid range
+        return np.clip(estimated, 0.5, 5.0)
+    
+    def _popular_items(self, n):
+        """Popular-item fallback for cold-start users, computed once per n."""
+        if n not in self._popular:
+            self._popular[n] = get_popular_items(self.df, n)
+        return self._popular[n]
+    
+    def predict_batch(self, user_ids, n=10, min_similarity=0.1, batch_size=64):
+        """
+        Generate recommendations for many users of the fitted data at once.
+        
+        Users are scored batch_size at a time: one sparse product gives the
+        similarity of every item to the items rated by anyone in the batch,
+        and sparse products with the batch's ratings give all their scores.
+        Each user's recommendations match recommend(); cold-start users get
+        the popular items.
+        
+        Parameters:
+        -----------
+        user_ids : array-like
+            The user IDs to generate recommendations for
+        n : int
+            Number of recommendations per user
+        min_similarity : float
+            Minimum similarity threshold (0-1). Items with lower similarity are ignored.
+        batch_size : int
+            Number of users scored together (bounds the size of the similarity slice)
+        
+        Returns:
+        --------
+        pd.DataFrame
+            Recommendations with columns: user_id, product_id, score,
+            estimated_rating; up to n rows per user, best first
+        
+        Raises:
+        -------
+        ValueError
+            If any user_id is not in the fitted data
+        """
+        user_ids = np.asarray(user_ids)
+        rows = self.user_index.get_indexer(user_ids)
+        if (rows < 0).any():
+            raise ValueError(f"Users {user_ids[rows < 0].tolist()} not found in dataset.")
+        
+        n_cold_start = int(np.count_nonzero(self.matrix[rows].max(axis=1).toarray().ravel() <= 0))
+        if n_cold_start:
+            print(f"⚠️  {n_cold_start} users have no ratings (cold start problem)")
+        
+        batches = [
+            self._recommend_rows(rows[start:start + batch_size], n, min_similarity)
+            for start in range(0, len(rows), batch_size)
+        ]
+        if not batches:
+            return pd.DataFrame(columns=["user_id", "product_id", "score", "estimated_rating"])
+        
+        return pd.concat(batches, ignore_index=True)
+    
+    def _recommend_rows(self, rows, n, min_similarity):
+        """Recommendations for one batch of user rows (see predict_batch)."""
+        user_ratings = self.matrix[rows]
+        
+        # Positive ratings of the batch, restricted to the items any of them rated
+        rated = user_ratings.copy()
+        rated.data = np.where(rated.data > 0, rated.data, 0)
+        rated.eliminate_zeros()
+        n_rated = np.diff(rated.indptr)
+        rated_items = np.unique(rated.indices)
+        # Dense (rated_items x users) operands: sparse x dense products are
+        # far cheaper than sparse x sparse ones with a dense result
+        rated = rated[:, rated_items].T.toarray()
+        rated_indicator = (rated > 0).astype(rated.dtype)
+        
+        # Similarity of every item to the batch's rated items (items x rated_items)
+        sim = (self.normalized.T @ self.normalized[:, rated_items]).tocsr()
+        keep = sim.data >= min_similarity
+        thresholded = sparse.csr_matrix((np.where(keep, sim.data, 0), sim.indices, sim.indptr),
+                                        shape=sim.shape)
+        
+        # Weighted sums, weights and hits per item (rows) and user (columns)
+        scores = thresholded @ rated
+        thresholded.data = np.abs(thresholded.data)
+        score_weights = thresholded @ rated_indicator
+        thresholded.data = keep.astype(sim.dtype)
+        has_similar = (thresholded @ rated_indicator) > 0
+        if min_similarity <= 0:
+            # Unstored similarities are exactly 0, which passes the threshold
+            thresholded.data = np.ones_like(sim.data)
+            n_stored = thresholded @ rated_indicator
+            has_similar |= n_stored < n_rated
+        np.divide(scores, score_weights, out=scores, where=score_weights > 0)
+        
+        candidates = (user_ratings.toarray() == 0).T & has_similar
+        
+        # Rows are emitted in the order of the batch; cold-start users get
+        # the popular items in place
+        users, products, user_scores, estimated = [], [], [], []
+        for column, row in enumerate(rows):
+            user_id = self.user_index[row]
+            if n_rated[column] == 0:
+                popular = self._popular_items(n)
+                top_products = popular['product_id'].to_numpy()
+                top_scores = popular['score'].to_numpy()
+                top_estimated = popular['estimated_rating'].to_numpy()
+            else:
+                items = np.flatnonzero(candidates[:, column])
+                top = items[_top_k_positions(scores[items, column], n)]
+                top_products = self.product_index[top].to_numpy()
+                top_scores = scores[top, column]
+                top_estimated = self._estimated_ratings(user_id, top_scores)
+            users.append(np.full(len(top_products), user_id))
+            products.append(top_products)
+            user_scores.append(top_scores)
+            estimated.append(top_estimated)
+        
+        return pd.DataFrame({
+            "user_id": np.concatenate(users),
+            "product_id": np.concatenate(products),
+            "score": np.concatenate(user_scores),
+            "estimated_rating": np.concatenate(estimated)
+        })
+
+
+def precompute_similarity(df, use_normalized=False, normalization_method='mean_center'):
+    """
+    Fit a RecommenderModel once so it can be shared by many users.
+    
+    Pass the result to recommend_for_user(..., model=model) to serve
+    recommendations without rebuilding the matrix on every call.
+    
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        DataFrame with columns: user_id, product_id, rating
+    use_normalized : bool
+        Whether to use normalized ratings for similarity calculation
+    normalization_method : str
+        Method for rating normalization ('mean_center', 'z_score', 'min_max')
+    
+    Returns:
+    --------
+    RecommenderModel
+        Model fitted on df
+    """
+    return RecommenderModel(use_normalized, normalization_method).fit(df)
+
+
+def _cold_start_fallback(df, user_id, n):
+    """Recommend popular items to a user without usable ratings."""
+    print(f"⚠️  User {user_id} has no ratings (cold start problem)")
+    # Fall back to top-rated items
+    return get_popular_items(df, n)
+
+
+# Model of the most recently used dataframe, reused by recommend_for_user.
+# The model holds its dataframe, so the cached frame stays in memory until
+# clear_model_cache() is called or another frame replaces it
+_model_cache = {}
+
+
+def clear_model_cache():
+    """Drop the model (and dataframe) cached by recommend_for_user."""
+    _model_cache.clear()
+
+
+def _frame_fingerprint(df):
+    """
+    Cheap summary of the ratings in df that changes when they are edited.
+    
+    A few vectorized reductions are far cheaper than refitting, and weighting
+    the ratings by the ids also catches ratings moved between rows.
+    """
+    ratings = df['rating'].to_numpy(dtype=np.float64)
+    return (len(df), float(ratings.sum()),
+            float(ratings @ df['user_id'].to_numpy(dtype=np.float64)),
+            float(ratings @ df['product_id'].to_numpy(dtype=np.float64)))
+
+
+def _cached_model(df, use_normalized, normalization_method):
+    """
+    Return the cached model for df and these settings, or None.
+    
+    The cache holds one entry keyed by id(df), the settings and a fingerprint
+    of the ratings, so editing the frame in place invalidates it. The entry
+    keeps its frame alive, so the id cannot be reused while cached; the
+    identity check only confirms the frame is the one the model was fit on.
+    """
+    cached = _model_cache.get('entry')
+    
+    if cached is not None and cached[1].df is df \
+            and cached[0] == (id(df), use_normalized, normalization_method, _frame_fingerprint(df)):
+        return cached[1]
+    return None
+
+
+def _fit_cached_model(df, use_normalized, normalization_method):
+    """Fit a model for df and make it the cached one."""
+    model = precompute_similarity(df, use_normalized, normalization_method)
+    key = (id(df), use_normalized, normalization_method, _frame_fingerprint(df))
+    _model_cache['entry'] = (key, model)
+    return model
 
 
 def recommend_for_user(df, user_id, n=10, min_similarity=0.1, use_normalized=False, 
-                       normalization_method='mean_center', min_common_items=2):
+                       normalization_method='mean_center', min_common_items=2, model=None):
     """
     Generate personalized recommendations using item-based collaborative filtering.
     
+    The fitted model for the most recently used dataframe is cached, so
+    repeated calls on the same df only do the per-user work. The cache keeps
+    that dataframe in memory; call clear_model_cache() to release it. Editing
+    the ratings in place refits the model on the next call.
+    
     Parameters:
     -----------
     df : pd.DataFrame
@@ -24,6 +460,10 @@ def recommend_for_user(df, user_id, n=10, min_similarity=0.1, use_normalized=Fal
         Method for rating normalization ('mean_center', 'z_score', 'min_max')
     min_common_items : int
         Minimum number of common ratings needed to calculate similarity
+    model : RecommenderModel, optional
+        Model fitted on df (e.g. by precompute_similarity). When given, its
+        normalization settings are used instead of use_normalized and
+        normalization_method.
     
     Returns:
     --------
@@ -35,91 +475,22 @@ def recommend_for_user(df, user_id, n=10, min_similarity=0.1, use_normalized=Fal
     ValueError
         If user_id is not found in the dataset
     """
-    # Check if user exists
-    if user_id not in df['user_id'].values:
-        raise ValueError(f"User {user_id} not found in dataset.")
-    
-    # Normalize ratings if requested
-    if use_normalized:
-        from .utils import normalize_ratings_per_user
-        df = normalize_ratings_per_user(df, method=normalization_method)
-        rating_col = 'normalized_rating'
-    else:
-        rating_col = 'rating'
-    
-    # Create user-item matrix
-    pivot = df.pivot_table(index="user_id", columns="product_id", values=rating_col)
-    matrix = pivot.fillna(0)
-    
-    # Calculate item-item similarity
-    similarity = cosine_similarity(matrix.T)
-    sim_df = pd.DataFrame(similarity, index=matrix.columns, columns=matrix.columns)
-    
-    # Get user's ratings
-    user_ratings = matrix.loc[user_id]
-    rated_items = user_ratings[user_ratings > 0].index
-    
-    # Check for cold start problem
-    if len(rated_items) == 0:
-        print(f"⚠️  User {user_id} has no ratings (cold start problem)")
-        # Fall back to top-rated items
-        return get_popular_items(df, n)
-    
-    if len(rated_items) < min_common_items:
-        print(f"⚠️  User {user_id} has very few ratings ({len(rated_items)}), recommendations may be unreliable")
-    
-    # Calculate weighted scores for unrated items
-    scores = {}
-    score_weights = {}  # Track sum of similarities for normalization
-    
-    for product in rated_items:
-        # Get similar items
-        similar_items = sim_df[product].drop(product)
-        rating = user_ratings[product]
-        
-        for other, sim in similar_items.items():
-            # Only consider unrated items with sufficient similarity
-            if user_ratings[other] == 0 and sim >= min_similarity:
-                scores.setdefault(other, 0)
-                score_weights.setdefault(other, 0)
-                
-                # Weighted sum: similarity * rating
-                scores[other] += sim * rating
-                score_weights[other] += abs(sim)
-    
-    # Normalize scores by sum of similarities
-    for item in scores:
-        if score_weights[item] > 0:
-            scores[item] = scores[item] / score_weights[item]
-    
-    # Convert to DataFrame
-    if not scores:
-        print(f"⚠️  No recommendations found for user {user_id} (try lowering min_similarity)")
-        return pd.DataFrame(columns=["product_id", "score", "estimated_rating"])
-    
-    recs = pd.DataFrame(scores.items(), columns=["product_id", "score"])
-    recs = recs.sort_values("score", ascending=False).head(n)
-    
-    # Denormalize if needed
-    if use_normalized:
-        from .utils import get_user_statistics
-        user_stats = get_user_statistics(df[df['user_id'] == user_id])
-        user_mean = user_stats['mean_rating'].iloc[0]
-        
-        if normalization_method == 'mean_center':
-            recs['estimated_rating'] = recs['score'] + user_mean
-        elif normalization_method == 'z_score':
-            user_std = user_stats['std_rating'].iloc[0]
-            recs['estimated_rating'] = (recs['score'] * user_std) + user_mean
-        else:
-            recs['estimated_rating'] = recs['score']
-    else:
-        recs['estimated_rating'] = recs['score']
+    if model is None:
+        model = _cached_model(df, use_normalized, normalization_method)
     
-    # Clip ratings to valid range
-    recs['estimated_rating'] = recs['estimated_rating'].clip(0.5, 5.0)
+    if model is None:
+        # No model yet: one scan of df checks that the user exists, and a user
+        # without positive raw ratings falls back before any model is built
+        # (normalized ratings decide this only after normalizing)
+        user_rows = df['user_id'].to_numpy() == user_id
+        if not user_rows.any():
+            raise ValueError(f"User {user_id} not found in dataset.")
+        if not use_normalized and not (df['rating'].to_numpy()[user_rows] > 0).any():
+            return _cold_start_fallback(df, user_id, n)
+        model = _fit_cached_model(df, use_normalized, normalization_method)
     
-    return recs
+    # Membership is then an O(1) lookup in the model's user index
+    return model.recommend(user_id, n, min_similarity, min_common_items)
 
 
 def get_popular_items(df, n=10, min_ratings=5):
@@ -140,18 +511,15 @@ def get_popular_items(df, n=10, min_ratings=5):
     pd.DataFrame
         Popular items with columns: product_id, score, estimated_rating
     """
-    popular = (
-        df.groupby('product_id')['rating']
-        .agg(['mean', 'count'])
-        .reset_index()
-    )
-    popular = popular[popular['count'] >= min_ratings]
-    popular = popular.sort_values('mean', ascending=False).head(n)
+    product_ids, counts, means = _ratings_per_id(df, 'product_id')
+    
+    eligible = np.flatnonzero(counts >= min_ratings)
+    top = eligible[_top_k_positions(means[eligible], n)]
     
     result = pd.DataFrame({
-        'product_id': popular['product_id'],
-        'score': popular['mean'],
-        'estimated_rating': popular['mean']
+        'product_id': product_ids[top],
+        'score': means[top],
+        'estimated_rating': means[top]
     })
     
     return result
@@ -1,8 +1,40 @@
+import numpy as np
 from datetime import datetime, timedelta
+from .utils import _top_k_positions
 
-def get_top_n_products(df, days, n):
+def get_top_n_products(df, days, n, sorted_by_time=None):
+    """
+    Get the n products with the best average rating in the last `days` days.
+    
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        DataFrame with columns: product_id, rating, timestamp
+    days : int
+        Size of the time window; ratings at or after the cutoff are kept
+    n : int
+        Number of products to return
+    sorted_by_time : bool or None
+        Whether df is sorted by timestamp, oldest first. True skips the O(n)
+        order check and finds the window by binary search (the caller
+        guarantees the order); False always filters with a mask; None
+        (default) checks the order on every call.
+    
+    Returns:
+    --------
+    pd.DataFrame
+        Products with columns: product_id, avg_rating, rating_count
+    """
     cutoff = datetime.now() - timedelta(days=days)
-    window = df[df["timestamp"] >= cutoff]
+    timestamps = df["timestamp"]
+    if sorted_by_time is None:
+        sorted_by_time = timestamps.is_monotonic_increasing
+    if sorted_by_time:
+        # Rating logs sorted by time: the window is a tail slice found by binary search
+        start = np.searchsorted(timestamps.to_numpy(), np.datetime64(cutoff), side="left")
+        window = df.iloc[start:]
+    else:
+        window = df[timestamps >= cutoff]
 
     grouped = (
         window.groupby("product_id")
@@ -12,4 +44,6 @@ def get_top_n_products(df, days, n):
 
     grouped = grouped[grouped["rating_count"] >= 5]  # optional quality filter
 
-    return grouped.sort_values("avg_rating", ascending=False).head(n)
+    # Partial selection of the n best averages instead of sorting every product
+    top = _top_k_positions(grouped["avg_rating"].to_numpy(), n)
+    return grouped.iloc[top]
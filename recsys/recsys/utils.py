@@ -1,8 +1,84 @@
 import pandas as pd
 import numpy as np
+from scipy import sparse
 
 
-def normalize_ratings_per_user(df, method='mean_center'):
+# Id column -> (code column, df.attrs key of the code -> id index)
+ID_CODE_COLUMNS = {
+    'user_id': ('user_code', 'user_index'),
+    'product_id': ('product_code', 'product_index'),
+}
+
+
+class IdMapping:
+    """
+    Code -> id index stored in df.attrs by load_ratings.
+    
+    pandas compares attrs with == when combining frames (pd.concat) and
+    deep-copies them on every derived frame. A bare pd.Index breaks the
+    former (elementwise ==) and makes the latter copy every id, so the
+    index is wrapped: equality is by value and copies share the index.
+    """
+    __slots__ = ('index',)
+    __hash__ = None
+    
+    def __init__(self, index):
+        self.index = index
+    
+    def __eq__(self, other):
+        return isinstance(other, IdMapping) and (
+            self.index is other.index or self.index.equals(other.index))
+    
+    def __len__(self):
+        return len(self.index)
+    
+    def __deepcopy__(self, memo):
+        # The index is never modified in place, so copies can share it
+        return self
+
+
+def _user_groups(df):
+    """
+    Group the rows of df by user_id for per-user reductions.
+    
+    A frame sorted by user_id is split into runs where the id changes and
+    reduced with ufunc.reduceat in one linear pass; otherwise rows are
+    grouped by get_id_codes and reduced with np.bincount / ufunc.at.
+    
+    Returns:
+    --------
+    codes, uniques, counts, reduce : tuple
+        Group code per row, user id and number of rows per code, and
+        reduce(ufunc, values) giving one np.add / np.minimum / np.maximum
+        reduction of values per code
+    """
+    user_ids = df['user_id']
+    
+    if len(df) > 0 and user_ids.is_monotonic_increasing:
+        ids = user_ids.to_numpy()
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+        counts = np.diff(np.r_[starts, len(ids)])
+        codes = np.repeat(np.arange(len(starts)), counts)
+        
+        def reduce(ufunc, values):
+            return ufunc.reduceat(values, starts)
+        
+        return codes, ids[starts], counts, reduce
+    
+    codes, uniques = get_id_codes(df, 'user_id')
+    counts = np.bincount(codes, minlength=len(uniques))
+    
+    def reduce(ufunc, values):
+        if ufunc is np.add:
+            return np.bincount(codes, weights=values, minlength=len(uniques))
+        out = np.full(len(uniques), np.inf if ufunc is np.minimum else -np.inf)
+        ufunc.at(out, codes, values)
+        return out
+    
+    return codes, uniques, counts, reduce
+
+
+def normalize_ratings_per_user(df, method='mean_center', return_stats=False):
     """
     Normalize ratings per user to handle rating bias.
     
@@ -19,40 +95,72 @@ def normalize_ratings_per_user(df, method='mean_center'):
         - 'mean_center': Subtract user's mean rating
         - 'z_score': Z-score normalization (mean=0, std=1)
         - 'min_max': Scale to 0-1 range per user
+    return_stats : bool
+        Whether to also return the per-user statistics used for normalizing
     
     Returns:
     --------
-    pd.DataFrame
-        DataFrame with additional 'normalized_rating' column
+    pd.Series
+        float32 'normalized_rating' Series aligned with df.index; assign it
+        with df.assign(normalized_rating=...) where a column is needed
+    pd.DataFrame, optional
+        If return_stats, per-user statistics indexed by user_id: mean_rating
+        (mean_center), mean_rating and std_rating (z_score), or min_rating
+        and max_rating (min_max)
     """
-    df = df.copy()
+    if method not in ('mean_center', 'z_score', 'min_max'):
+        raise ValueError(f"Unknown normalization method: {method}")
+    
+    # Per-user statistics from one reduction per statistic (sorted runs or
+    # user codes), then gathered back to the rows by code
+    codes, uniques, counts, reduce = _user_groups(df)
+    ratings = df['rating'].to_numpy(dtype=np.float64)
+    n_users = len(uniques)
+    
+    if method in ('mean_center', 'z_score'):
+        sums = reduce(np.add, ratings)
+        # Codes reused from load_ratings may not all occur in a filtered frame
+        means = np.divide(sums, counts, out=np.zeros(n_users), where=counts > 0)
+        deviations = ratings - means[codes]
     
     if method == 'mean_center':
         # Subtract each user's mean rating
-        user_means = df.groupby('user_id')['rating'].transform('mean')
-        df['normalized_rating'] = df['rating'] - user_means
+        normalized = deviations
+        stats = {'mean_rating': means}
         
     elif method == 'z_score':
-        # Z-score: (rating - mean) / std
-        user_means = df.groupby('user_id')['rating'].transform('mean')
-        user_stds = df.groupby('user_id')['rating'].transform('std')
+        # Z-score: (rating - mean) / std, with the sample std (undefined for one rating)
+        squares = reduce(np.add, deviations * deviations)
+        stds = np.sqrt(np.divide(squares, counts - 1, out=np.full(n_users, np.nan),
+                                 where=counts > 1))
         # Avoid division by zero for users with constant ratings
-        user_stds = user_stds.replace(0, 1)
-        df['normalized_rating'] = (df['rating'] - user_means) / user_stds
+        scales = np.where(stds == 0, 1, stds)
+        normalized = deviations / scales[codes]
+        stats = {'mean_rating': means, 'std_rating': stds}
         
-    elif method == 'min_max':
+    else:
         # Scale to 0-1 range per user
-        user_min = df.groupby('user_id')['rating'].transform('min')
-        user_max = df.groupby('user_id')['rating'].transform('max')
+        user_min = reduce(np.minimum, ratings)
+        user_max = reduce(np.maximum, ratings)
         user_range = user_max - user_min
         # Avoid division by zero
-        user_range = user_range.replace(0, 1)
-        df['normalized_rating'] = (df['rating'] - user_min) / user_range
-        
-    else:
-        raise ValueError(f"Unknown normalization method: {method}")
+        user_range[user_range == 0] = 1
+        normalized = (ratings - user_min[codes]) / user_range[codes]
+        stats = {'min_rating': user_min, 'max_rating': user_max}
+    
+    # Statistics are accumulated in float64; the stored ratings only need float32
+    normalized = pd.Series(normalized.astype(np.float32), index=df.index, name='normalized_rating')
+    
+    if not return_stats:
+        return normalized
     
-    return df
+    # Only users that occur in df (reused load-time codes may have gaps)
+    present = counts > 0
+    user_stats = pd.DataFrame(
+        {name: values[present] for name, values in stats.items()},
+        index=pd.Index(np.asarray(uniques)[present], name='user_id')
+    )
+    return normalized, user_stats
 
 
 def denormalize_rating(normalized_rating, user_mean, user_std=1.0, method='mean_center'):
@@ -109,6 +217,139 @@ def get_user_statistics(df):
     return stats
 
 
+def get_id_codes(df, column):
+    """
+    Get dense integer codes for an id column.
+    
+    Reuses the codes attached by load_ratings when present, otherwise
+    factorizes the column. Codes reused from load_ratings index into the
+    ids of the full loaded dataset, so on a filtered dataframe some codes
+    may not occur.
+    
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        DataFrame with the id column
+    column : str
+        Id column to encode ('user_id' or 'product_id')
+    
+    Returns:
+    --------
+    codes, uniques : tuple of (np.ndarray, pd.Index)
+        int32 code per row, and the id value for each code
+    """
+    code_col, index_key = ID_CODE_COLUMNS[column]
+    
+    if code_col in df.columns and index_key in df.attrs:
+        return df[code_col].to_numpy(), df.attrs[index_key].index
+    
+    codes, uniques = pd.factorize(df[column], sort=True)
+    return codes.astype(np.int32), uniques
+
+
+def _present_codes(codes, uniques):
+    """Renumber codes densely over the ids that actually occur."""
+    present = np.bincount(codes, minlength=len(uniques)) > 0
+    if present.all():
+        return codes, uniques
+    remap = np.cumsum(present, dtype=np.int32) - 1
+    return remap[codes], uniques[present]
+
+
+def build_sparse_matrix(df, normalize=True, rating_col='rating', threshold=0.0):
+    """
+    Build the user-item rating matrix as a scipy CSR matrix.
+    
+    Only observed ratings are stored, so memory and downstream similarity
+    computations (e.g. X.T @ X over L2-normalized item columns) scale with
+    the number of ratings rather than users * items. Duplicate (user_id,
+    product_id) pairs are averaged, as pivot_table's default mean did.
+    
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        DataFrame with columns: user_id, product_id and rating_col
+    normalize : bool
+        Whether to subtract each user's mean rating from their stored ratings
+        (unrated cells stay implicit zeros)
+    rating_col : str
+        Column holding the rating values (default: 'rating')
+    threshold : float
+        Drop stored entries whose absolute value is below this, e.g. 0.1 to
+        keep only centered ratings that differ noticeably from the user's
+        mean (default: 0.0, only exact zeros are dropped)
+    
+    Returns:
+    --------
+    matrix, user_index, product_index : tuple
+        float32 CSR matrix of shape (users, items), and the user / product id
+        for each row / column (only ids that occur in df)
+    """
+    user_codes, user_index = _present_codes(*get_id_codes(df, 'user_id'))
+    product_codes, product_index = _present_codes(*get_id_codes(df, 'product_id'))
+    
+    # One linear COO pass over the ratings; tocsr() sums duplicate pairs
+    shape = (len(user_index), len(product_index))
+    matrix = sparse.coo_matrix(
+        (df[rating_col].to_numpy(dtype=np.float32), (user_codes, product_codes)),
+        shape=shape, dtype=np.float32
+    ).tocsr()
+    
+    if matrix.nnz < len(df):
+        # Duplicate pairs: divide the sums by the pair counts, built from the
+        # same coordinates so both matrices share one sparsity structure
+        pair_counts = sparse.coo_matrix(
+            (np.ones(len(df), dtype=np.float32), (user_codes, product_codes)),
+            shape=shape
+        ).tocsr()
+        matrix.data /= pair_counts.data
+    
+    if normalize:
+        # Mean-center the stored entries of each row in place
+        counts = np.diff(matrix.indptr)
+        sums = np.asarray(matrix.sum(axis=1)).ravel()
+        means = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+        matrix.data -= np.repeat(means, counts).astype(np.float32)
+    
+    if threshold > 0:
+        matrix.data[np.abs(matrix.data) < threshold] = 0
+    if normalize or threshold > 0:
+        # Ratings equal to the user's mean (or below the threshold) carry no
+        # signal; drop them from the sparsity structure
+        matrix.eliminate_zeros()
+    
+    return matrix, user_index, product_index
+
+
+def _ratings_per_id(df, column):
+    """
+    Count and average ratings per id with np.bincount over dense id codes.
+    
+    Returns:
+    --------
+    ids, counts, mean_ratings : tuple of np.ndarray
+        Ids that occur in df, their number of ratings and mean rating
+    """
+    codes, uniques = get_id_codes(df, column)
+    counts = np.bincount(codes, minlength=len(uniques))
+    sums = np.bincount(codes, weights=df['rating'].to_numpy(), minlength=len(uniques))
+    present = counts > 0
+    return np.asarray(uniques)[present], counts[present], sums[present] / counts[present]
+
+
+def _top_k_positions(values, k):
+    """
+    Positions of the k largest values, largest first (ties by position).
+    
+    Uses np.argpartition so only the k selected values are sorted.
+    """
+    k = min(k, len(values))
+    if k <= 0:
+        return np.array([], dtype=np.intp)
+    top = np.argpartition(values, -k)[-k:]
+    return top[np.lexsort((top, -values[top]))]
+
+
 def calculate_sparsity(df):
     """
     Calculate the sparsity of the user-item matrix.
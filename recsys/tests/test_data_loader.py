@@ -0,0 +1,95 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+import pandas as pd
+from recsys.data_loader import load_ratings
+
+try:
+    import polars  # noqa: F401
+    import pyarrow  # noqa: F401
+    HAS_POLARS = True
+except ImportError:
+    HAS_POLARS = False
+
+
+class TestLoadRatings(unittest.TestCase):
+    
+    def setUp(self):
+        """Write a small ratings CSV with missing, out-of-range and duplicate rows"""
+        handle, self.path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w') as f:
+            f.write(
+                "user_id,product_id,rating,timestamp\n"
+                "1,101,5.0,1260759144\n"
+                "1,102,4.0,1260759179\n"
+                "2,101,3.5,1260759182\n"
+                "2,103,,1260759185\n"
+                "3,102,7.0,1260759205\n"
+                "3,104,2.5,1260759151\n"
+                "2,101,4.5,1260759190\n"
+                "4,103,1.0,1260759139\n"
+            )
+    
+    def tearDown(self):
+        os.remove(self.path)
+    
+    def _load(self, **kwargs):
+        with redirect_stdout(io.StringIO()):
+            return load_ratings(self.path, **kwargs)
+    
+    @unittest.skipUnless(HAS_POLARS, "polars and pyarrow are required")
+    def test_polars_backend_matches_pandas(self):
+        """Test that both backends return the same rows, dtypes and attrs"""
+        expected = self._load(backend='pandas')
+        result = self._load(backend='polars')
+        
+        # pandas keeps the CSV row labels of the surviving rows, polars renumbers
+        pd.testing.assert_frame_equal(result.reset_index(drop=True),
+                                      expected.reset_index(drop=True))
+        self.assertEqual(set(result.attrs), set(expected.attrs))
+        for key in expected.attrs:
+            self.assertEqual(result.attrs[key], expected.attrs[key])
+    
+    def test_loaded_frames_can_be_concatenated(self):
+        """Test that pd.concat keeps the shared code -> id mappings"""
+        df = self._load()
+        
+        combined = pd.concat([df.iloc[:2], df.iloc[2:]])
+        
+        self.assertEqual(combined.attrs, df.attrs)
+    
+    def _write_rows(self, rows):
+        with open(self.path, 'w') as f:
+            f.write("user_id,product_id,rating,timestamp\n" + rows)
+    
+    def _backends(self):
+        return ['pandas', 'polars'] if HAS_POLARS else ['pandas']
+    
+    def test_malformed_id_column(self):
+        """Test that a non-numeric id raises the conversion ValueError"""
+        self._write_rows("1,101,5.0,1260759144\nabc,102,4.0,1260759179\n")
+        
+        for backend in self._backends():
+            with self.subTest(backend=backend):
+                with self.assertRaisesRegex(ValueError, "Error converting data types"):
+                    self._load(backend=backend)
+    
+    def test_id_overflowing_int32(self):
+        """Test that an id above the int32 range raises instead of wrapping"""
+        self._write_rows("1,101,5.0,1260759144\n1,3000000000,4.0,1260759179\n")
+        
+        for backend in self._backends():
+            with self.subTest(backend=backend):
+                with self.assertRaisesRegex(ValueError, "Error converting data types"):
+                    self._load(backend=backend)
+    
+    def test_unknown_backend(self):
+        """Test that an unknown backend raises ValueError"""
+        with self.assertRaises(ValueError):
+            self._load(backend='spark')
+
+
+if __name__ == '__main__':
+    unittest.main()
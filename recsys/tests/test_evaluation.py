@@ -0,0 +1,167 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+import numpy as np
+import pandas as pd
+from recsys.recommend_user import recommend_for_user
+from recsys.evaluation import (
+    split_train_test, evaluate_recommendations,
+    precision_at_k, recall_at_k, f1_score_at_k,
+    calculate_rmse, calculate_mae, calculate_error_metrics,
+    evaluate_rating_prediction
+)
+
+
+class TestSplitTrainTest(unittest.TestCase):
+    
+    def setUp(self):
+        """Create sample data with a duplicated index, as left by pd.concat"""
+        self.df = pd.DataFrame({
+            'user_id': [1] * 10 + [2] * 5 + [3] * 5 + [4] * 2,
+            'product_id': range(22),
+            'rating': [4.0] * 22
+        }, index=list(range(10)) * 2 + [0, 1])
+    
+    def test_split_is_a_partition(self):
+        """Test that train and test split the valid rows exactly once"""
+        train_df, test_df = split_train_test(self.df, test_size=0.2)
+        
+        products = list(train_df['product_id']) + list(test_df['product_id'])
+        self.assertEqual(sorted(products), list(range(20)))
+    
+    def test_every_user_in_both_halves(self):
+        """Test that a small test_size still leaves each valid user in both sets"""
+        train_df, test_df = split_train_test(self.df, test_size=0.1)
+        
+        self.assertEqual(set(train_df['user_id']), {1, 2, 3})
+        self.assertEqual(set(test_df['user_id']), {1, 2, 3})
+
+
+class TestEvaluateRecommendations(unittest.TestCase):
+    
+    def test_parallel_matches_serial(self):
+        """Test that evaluating users in joblib batches gives the serial metrics"""
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({
+            'user_id': np.repeat(np.arange(1, 21), 10),
+            'product_id': rng.integers(100, 130, 200),
+            'rating': rng.integers(1, 11, 200) / 2
+        }).drop_duplicates(['user_id', 'product_id'])
+        
+        with redirect_stdout(io.StringIO()):
+            train_df, test_df = split_train_test(df, test_size=0.3)
+            serial = evaluate_recommendations(train_df, test_df, recommend_for_user,
+                                              k_values=[5, 10], n_jobs=1)
+            parallel = evaluate_recommendations(train_df, test_df, recommend_for_user,
+                                                k_values=[5, 10], n_jobs=2)
+        
+        self.assertEqual(set(serial), {5, 10})
+        self.assertEqual(set(parallel), set(serial))
+        for k in serial:
+            for metric, value in serial[k].items():
+                self.assertAlmostEqual(parallel[k][metric], value)
+
+
+class TestRankingMetrics(unittest.TestCase):
+    
+    def setUp(self):
+        """Create sample recommendations for testing"""
+        self.recommended = [101, 102, 103, 104, 105]
+        self.relevant = {101, 103, 110}
+    
+    def test_metrics_at_k(self):
+        """Test precision, recall and F1 against hand-computed values"""
+        self.assertAlmostEqual(precision_at_k(self.recommended, self.relevant, 3), 2 / 3)
+        self.assertAlmostEqual(recall_at_k(self.recommended, self.relevant, 3), 2 / 3)
+        self.assertAlmostEqual(f1_score_at_k(self.recommended, self.relevant, 3), 2 / 3)
+    
+    def test_k_larger_than_recommendations(self):
+        """Test that K beyond the recommendation list still divides by K"""
+        self.assertAlmostEqual(precision_at_k(self.recommended, self.relevant, 10), 0.2)
+        self.assertAlmostEqual(recall_at_k(self.recommended, self.relevant, 10), 2 / 3)
+        self.assertEqual(precision_at_k(self.recommended, self.relevant, 0), 0.0)
+
+
+class TestErrorMetrics(unittest.TestCase):
+    
+    def test_error_metrics(self):
+        """Test that the fused RMSE/MAE match the individual metrics"""
+        actual = [4.0, 3.0, 5.0, 2.5]
+        predicted = [3.5, 3.0, 4.0, 3.5]
+        
+        rmse, mae = calculate_error_metrics(actual, predicted)
+        
+        self.assertAlmostEqual(rmse, (2.25 / 4) ** 0.5)
+        self.assertAlmostEqual(mae, 2.5 / 4)
+        self.assertAlmostEqual(calculate_rmse(actual, predicted), rmse)
+        self.assertAlmostEqual(calculate_mae(actual, predicted), mae)
+
+
+
+class TestEvaluateRatingPrediction(unittest.TestCase):
+    
+    def setUp(self):
+        """Create test pairs and a lookup of predicted ratings"""
+        self.train_df = pd.DataFrame({'user_id': [1], 'product_id': [1], 'rating': [4.0]})
+        self.test_df = pd.DataFrame({
+            'user_id': [1, 1, 2, 2, 3],
+            'product_id': [10, 11, 10, 12, 11],
+            'rating': [4.0, 3.0, 5.0, 2.0, 3.5]
+        })
+        self.predictions = {(1, 10): 3.5, (1, 11): 3.0, (2, 10): 4.0, (2, 12): 3.0, (3, 11): 3.5}
+    
+    def _evaluate(self, predict_func):
+        with redirect_stdout(io.StringIO()):
+            return evaluate_rating_prediction(self.train_df, self.test_df, predict_func)
+    
+    def test_batched_matches_per_pair(self):
+        """Test that a batched callable gives the same metrics as a per-pair one"""
+        calls = []
+        
+        def predict_pair(train_df, user_id, product_id):
+            return self.predictions[(user_id, product_id)]
+        
+        def predict_batch(train_df, user_ids, product_ids):
+            calls.append(len(user_ids))
+            return [self.predictions[pair] for pair in zip(user_ids, product_ids)]
+        predict_batch.batched = True
+        
+        expected = self._evaluate(predict_pair)
+        result = self._evaluate(predict_batch)
+        
+        self.assertEqual(calls, [5])
+        self.assertEqual(result['n_predictions'], 5)
+        self.assertAlmostEqual(result['rmse'], expected['rmse'])
+        self.assertAlmostEqual(result['mae'], expected['mae'])
+    
+    def test_per_pair_ids_are_ints(self):
+        """Test that the per-pair callable gets integer ids, not floats"""
+        seen = []
+        
+        def predict_pair(train_df, user_id, product_id):
+            seen.append((type(user_id), type(product_id)))
+            return self.predictions[(user_id, product_id)]
+        
+        self._evaluate(predict_pair)
+        
+        self.assertEqual(set(seen), {(int, int)})
+    
+    def test_nan_and_failed_predictions_are_skipped(self):
+        """Test that NaN predictions and pairs that raise are not counted"""
+        def predict_pair(train_df, user_id, product_id):
+            if user_id == 2:
+                raise KeyError(product_id)
+            if user_id == 3:
+                return np.nan
+            return self.predictions[(user_id, product_id)]
+        
+        result = self._evaluate(predict_pair)
+        
+        self.assertEqual(result['n_predictions'], 2)
+        rmse, mae = calculate_error_metrics([4.0, 3.0], [3.5, 3.0])
+        self.assertAlmostEqual(result['rmse'], rmse)
+        self.assertAlmostEqual(result['mae'], mae)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
+from unittest import mock
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
 from recsys.recommended_top import get_top_n_products
 
 
@@ -32,6 +33,46 @@ class TestTopRecommendations(unittest.TestCase):
         self.assertEqual(top_product['product_id'], 101)
         self.assertEqual(top_product['avg_rating'], 5.0)
 
+    
+    def test_sorted_and_shuffled_inputs_agree(self):
+        """Test that the sorted-timestamp slice and the mask give the same top-n"""
+        now = datetime.now()
+        n_rows = 60
+        df = pd.DataFrame({
+            'user_id': range(n_rows),
+            'product_id': [101 + i % 4 for i in range(n_rows)],
+            'rating': [1.0 + (i * 7) % 9 / 2 for i in range(n_rows)],
+            # Oldest first; the first ten rows fall outside a 30-day window
+            'timestamp': [now - timedelta(days=34.75 - i / 2) for i in range(n_rows)]
+        })
+        
+        expected = get_top_n_products(df, days=30, n=3)
+        result = get_top_n_products(df.sample(frac=1, random_state=0), days=30, n=3)
+        
+        pd.testing.assert_frame_equal(result.reset_index(drop=True),
+                                      expected.reset_index(drop=True))
+        self.assertEqual(get_top_n_products(df, days=30, n=4)['rating_count'].sum(), 50)
+
+    
+    def test_rating_at_cutoff_is_kept(self):
+        """Test that a timestamp equal to the cutoff is inside the window"""
+        now = datetime(2024, 1, 31, 12, 0, 0)
+        cutoff = now - timedelta(days=30)
+        df = pd.DataFrame({
+            'user_id': range(10),
+            'product_id': [101] * 5 + [102] * 5,
+            'rating': [2.0] * 5 + [5.0] * 5,
+            # Product 102 is rated just before the cutoff, product 101 exactly at it
+            'timestamp': [cutoff] * 5 + [cutoff - timedelta(microseconds=1)] * 5
+        }).sort_values('timestamp', ignore_index=True)
+        
+        with mock.patch('recsys.recommended_top.datetime') as fake_datetime:
+            fake_datetime.now.return_value = now
+            for sorted_by_time in [None, True, False]:
+                with self.subTest(sorted_by_time=sorted_by_time):
+                    result = get_top_n_products(df, days=30, n=5, sorted_by_time=sorted_by_time)
+                    self.assertEqual(result['product_id'].tolist(), [101])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,7 +1,13 @@
+import gc
 import unittest
+import weakref
+from unittest import mock
+import numpy as np
 import pandas as pd
+from scipy import sparse
 from datetime import datetime
-from recsys.recommend_user import recommend_for_user
+from recsys import recommend_user
+from recsys.recommend_user import recommend_for_user, RecommenderModel, clear_model_cache
 
 
 class TestUserRecommendations(unittest.TestCase):
@@ -31,6 +37,110 @@ class TestUserRecommendations(unittest.TestCase):
         
         overlap = set(user_1_products) & set(recommended_products)
         self.assertEqual(len(overlap), 0, "User should not get products they already rated")
+    
+    def test_clear_model_cache_releases_dataframe(self):
+        """Test that clearing the cache frees the last recommended dataframe"""
+        df = self.df.copy()
+        recommend_for_user(df, user_id=1, n=2)
+        df_ref = weakref.ref(df)
+        
+        clear_model_cache()
+        del df
+        gc.collect()
+        
+        self.assertIsNone(df_ref())
+    
+    def test_in_place_edit_refits_cached_model(self):
+        """Test that editing ratings in place does not reuse the stale model"""
+        df = self.df.copy()
+        recommend_for_user(df, user_id=1, n=5)
+        
+        df.loc[(df['user_id'] == 1) & (df['product_id'] == 101), 'rating'] = 1.0
+        result = recommend_for_user(df, user_id=1, n=5)
+        
+        expected = RecommenderModel().fit(df.copy()).recommend(1, n=5)
+        pd.testing.assert_frame_equal(result, expected)
+        self.assertEqual(result.loc[result['product_id'] == 104, 'estimated_rating'].item(), 1.0)
+    
+    def test_fitted_model_matches_recommend_for_user(self):
+        """Test that a fitted model gives the same recommendations as the function"""
+        model = RecommenderModel().fit(self.df)
+        
+        expected = recommend_for_user(self.df, user_id=1, n=5)
+        result = model.recommend(1, n=5)
+        
+        pd.testing.assert_frame_equal(result, expected)
+    
+    def test_predict_batch_matches_recommend(self):
+        """Test that batched recommendations match per-user recommendations"""
+        model = RecommenderModel().fit(self.df)
+        
+        result = model.predict_batch([1, 2, 3, 4], n=5, min_similarity=0.0)
+        
+        for user_id in [1, 2, 3, 4]:
+            expected = model.recommend(user_id, n=5, min_similarity=0.0)
+            batch = result[result['user_id'] == user_id]
+            self.assertEqual(list(batch['product_id']), list(expected['product_id']))
+    
+    def test_predict_batch_keeps_user_order_with_cold_start(self):
+        """Test that a cold-start user's fallback rows stay in the batch order"""
+        df = pd.DataFrame({
+            'user_id': [1, 2, 3, 4, 5, 1, 2, 3, 3, 4, 5, 6],
+            'product_id': [101, 101, 101, 101, 101, 102, 102, 102, 104, 104, 104, 103],
+            'rating': [5.0, 4.0, 4.5, 3.0, 4.0, 4.0, 3.5, 5.0, 2.0, 3.0, 4.5, 0.0]
+        })
+        model = RecommenderModel().fit(df)
+        
+        result = model.predict_batch([1, 6, 2], n=5)
+        
+        self.assertEqual(list(dict.fromkeys(result['user_id'])), [1, 6, 2])
+        cold_start = result[result['user_id'] == 6]
+        self.assertEqual(list(cold_start['product_id']), list(model.recommend(6, n=5)['product_id']))
+
+
+
+class TestAccumulateScores(unittest.TestCase):
+    
+    def setUp(self):
+        """Create a random similarity slice with negative and unstored entries"""
+        rng = np.random.default_rng(0)
+        self.sim_rated = sparse.random(50, 8, density=0.4, format='csr', dtype=np.float32,
+                                       random_state=rng, data_rvs=lambda k: rng.uniform(-1, 1, k))
+        self.ratings = rng.uniform(0.5, 5.0, 8)
+    
+    def _accumulate(self, min_similarity, use_numba):
+        with mock.patch.object(recommend_user, '_HAS_NUMBA', use_numba):
+            return recommend_user._accumulate_scores(self.sim_rated, self.ratings, min_similarity)
+    
+    def test_spmv_path_matches_dense_reference(self):
+        """Test the SpMV fallback against a dense loop over the thresholds"""
+        dense = self.sim_rated.toarray()
+        stored = dense != 0
+        
+        for min_similarity in [0.1, 0.0, -1.0]:
+            with self.subTest(min_similarity=min_similarity):
+                # Stored similarities below the threshold count as 0; unstored
+                # ones are exactly 0
+                passes = np.where(stored, dense >= min_similarity, min_similarity <= 0)
+                kept = np.where(stored & passes, dense, 0)
+                
+                sums, weights, similar = self._accumulate(min_similarity, use_numba=False)
+                
+                np.testing.assert_allclose(sums, kept @ self.ratings.astype(np.float32), rtol=1e-5)
+                np.testing.assert_allclose(weights, np.abs(kept).sum(axis=1), rtol=1e-5)
+                np.testing.assert_array_equal(similar, passes.any(axis=1))
+    
+    @unittest.skipUnless(recommend_user._HAS_NUMBA, "numba is not installed")
+    def test_numba_path_matches_spmv_path(self):
+        """Test that the numba kernel and the SpMV fallback agree"""
+        for min_similarity in [0.1, 0.0, -1.0]:
+            with self.subTest(min_similarity=min_similarity):
+                expected = self._accumulate(min_similarity, use_numba=False)
+                result = self._accumulate(min_similarity, use_numba=True)
+                
+                np.testing.assert_allclose(result[0], expected[0], rtol=1e-5, atol=1e-6)
+                np.testing.assert_allclose(result[1], expected[1], rtol=1e-5, atol=1e-6)
+                np.testing.assert_array_equal(result[2], expected[2])
 
 
 if __name__ == '__main__':
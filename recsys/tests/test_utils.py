@@ -0,0 +1,107 @@
+import unittest
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from recsys.utils import build_sparse_matrix, normalize_ratings_per_user
+
+
+class TestSparseMatrix(unittest.TestCase):
+    
+    def setUp(self):
+        """Create sample data for testing"""
+        self.df = pd.DataFrame({
+            'user_id': [1, 1, 2, 2, 3, 3, 4, 4],
+            'product_id': [101, 102, 101, 103, 102, 103, 101, 104],
+            'rating': [5.0, 4.0, 5.0, 3.0, 4.5, 4.0, 5.0, 2.0],
+            'timestamp': [datetime.now()] * 8
+        })
+    
+    def test_build_sparse_matrix(self):
+        """Test that the matrix stores exactly the observed ratings"""
+        matrix, user_index, product_index = build_sparse_matrix(self.df, normalize=False)
+        
+        self.assertEqual(matrix.shape, (4, 4))
+        self.assertEqual(matrix.nnz, 8)
+        row = list(user_index).index(2)
+        col = list(product_index).index(103)
+        self.assertEqual(matrix[row, col], 3.0)
+    
+    def test_duplicate_ratings_are_averaged(self):
+        """Test that a repeated (user, product) pair stores its mean rating"""
+        df = pd.concat([self.df, self.df.iloc[[3]].assign(rating=5.0)], ignore_index=True)
+        
+        matrix, user_index, product_index = build_sparse_matrix(df, normalize=False)
+        
+        self.assertEqual(matrix.nnz, 8)
+        row = list(user_index).index(2)
+        col = list(product_index).index(103)
+        self.assertEqual(matrix[row, col], 4.0)
+    
+    def test_normalized_rows_are_mean_centered(self):
+        """Test that each user's stored ratings sum to zero after centering"""
+        matrix, _, _ = build_sparse_matrix(self.df, normalize=True)
+        
+        row_sums = np.asarray(matrix.sum(axis=1)).ravel()
+        np.testing.assert_allclose(row_sums, 0.0, atol=1e-6)
+    
+    def test_threshold_drops_small_centered_ratings(self):
+        """Test that centered ratings below the threshold are not stored"""
+        matrix, user_index, _ = build_sparse_matrix(self.df, normalize=True, threshold=0.3)
+        
+        # User 3 rated 4.5 and 4.0, so both centered ratings are +-0.25
+        self.assertEqual(matrix.nnz, 6)
+        self.assertEqual(matrix[list(user_index).index(3)].nnz, 0)
+        self.assertTrue((np.abs(matrix.data) >= 0.3).all())
+
+
+class TestNormalizeRatings(unittest.TestCase):
+    
+    def setUp(self):
+        """Create sample data for testing"""
+        self.df = pd.DataFrame({
+            'user_id': [1, 1, 2, 2, 3],
+            'product_id': [101, 102, 101, 103, 102],
+            'rating': [5.0, 3.0, 2.0, 2.0, 4.0]
+        })
+    
+    def test_returns_series_without_touching_df(self):
+        """Test that the normalized ratings come back as an aligned Series"""
+        result = normalize_ratings_per_user(self.df, method='mean_center')
+        
+        self.assertIsInstance(result, pd.Series)
+        self.assertTrue(result.index.equals(self.df.index))
+        self.assertNotIn('normalized_rating', self.df.columns)
+        np.testing.assert_allclose(result.to_numpy(), [1.0, -1.0, 0.0, 0.0, 0.0])
+    
+    def _expected(self, df, method):
+        """Reference normalization with groupby().transform"""
+        ratings = df.groupby('user_id')['rating']
+        if method == 'z_score':
+            return (df['rating'] - ratings.transform('mean')) / ratings.transform('std').replace(0, 1)
+        user_min = ratings.transform('min')
+        return (df['rating'] - user_min) / (ratings.transform('max') - user_min).replace(0, 1)
+    
+    def test_z_score_and_min_max_match_groupby(self):
+        """Test both normalizations on sorted and unsorted users, with single ratings"""
+        df = pd.DataFrame({
+            'user_id': [2, 1, 3, 1, 2, 4, 1, 2],
+            'product_id': [101, 102, 103, 104, 105, 106, 107, 108],
+            'rating': [4.0, 5.0, 3.0, 2.0, 4.0, 1.5, 3.5, 2.5]
+        })
+        sorted_df = df.sort_values('user_id', kind='stable')
+        
+        for frame in (df, sorted_df):
+            for method in ('z_score', 'min_max'):
+                with self.subTest(sorted=frame is sorted_df, method=method):
+                    result = normalize_ratings_per_user(frame, method=method)
+                    np.testing.assert_allclose(result.to_numpy(),
+                                               self._expected(frame, method).to_numpy(),
+                                               rtol=1e-6)
+        
+        # Users 3 and 4 have a single rating: undefined sample std
+        z_scores = normalize_ratings_per_user(df, method='z_score')
+        self.assertTrue(z_scores[df['user_id'].isin([3, 4])].isna().all())
+
+
+if __name__ == '__main__':
+    unittest.main()